@@ -4,11 +4,24 @@
 # Used for Hamburg → Munich EV Truck Routing
 # ===============================================================
 
+import functools
+import hashlib
+import os
+
 import pandas as pd
 import numpy as np
-from shapely.geometry import Point
 import geopandas as gpd
-import osmnx as ox
+
+from geo_utils import EARTH_RADIUS_KM, NearestNodeIndex, haversine_km
+
+# Bump when the cached EAFO subset changes layout or dtypes
+_EAFO_CACHE_VERSION = 3
+
+# SOC quantisation of the charging-time cache (1/1000 = 0.1% SOC)
+_SOC_CACHE_STEPS = 1000
+
+# Largest route × station matrix filtered by dense haversine (~16 MB)
+_HAVERSINE_MAX_PAIRS = 2_000_000
 
 
 class ChargingStationManager:
@@ -23,8 +36,14 @@ class ChargingStationManager:
         - graph: OSMnx road network graph for Germany
         """
         self.graph = graph
+        self._node_index = None  # NearestNodeIndex over self.graph (lazy)
         self.stations = None     # will become a GeoDataFrame
 
+        # Column arrays aligned with self.stations rows
+        self.stations_lat = None
+        self.stations_lon = None
+        self.stations_power = None
+
         # MAN/Mercedes compatible fast-charging levels
         self.valid_power_levels_kw = [150, 300, 350, 750]  # HPC + MCS
 
@@ -35,6 +54,12 @@ class ChargingStationManager:
         self.cc_efficiency = 0.93
         self.cv_efficiency = 0.88
 
+        # Inverse charge curves: power level → (soc_grid, minutes from 0 SOC)
+        self._inv_curve = self._build_charge_curves()
+        self._charging_time_cached = functools.lru_cache(maxsize=4096)(
+            self._charging_time_quantised
+        )
+
     # ===============================================================
     # LOAD EAFO DATASET
     # ===============================================================
@@ -51,10 +76,7 @@ class ChargingStationManager:
         - StationName / Operator (optional)
         """
 
-        df = pd.read_csv(csv_path)
-
-        # Filter Germany only
-        df = df[df["Country"].str.contains("Germany", case=False, na=False)]
+        df = self._read_germany_subset(csv_path)
 
         # Filter heavy-duty suitable power levels
         df = df[df["Power_kW"] >= 150]
@@ -72,8 +94,62 @@ class ChargingStationManager:
         )
 
         self.stations = gdf
+        self.stations_lat = df["Latitude"].to_numpy(dtype=np.float64)
+        self.stations_lon = df["Longitude"].to_numpy(dtype=np.float64)
+        self.stations_power = df["Power_kW"].to_numpy(dtype=np.float32)
         return self.stations
 
+    def _read_germany_subset(self, csv_path):
+        """
+        Read the Germany rows of the EAFO CSV.
+
+        The filtered subset is cached as Parquet next to the CSV, keyed
+        on the CSV path and modification time, so repeat loads skip CSV
+        parsing and the string filter.
+        """
+        stat_key = (
+            f"{os.path.abspath(csv_path)}:{os.path.getmtime(csv_path)}"
+            f":{_EAFO_CACHE_VERSION}"
+        )
+        digest = hashlib.sha1(stat_key.encode()).hexdigest()[:16]
+        cache_path = os.path.join(
+            os.path.dirname(csv_path),
+            f".{os.path.basename(csv_path)}.{digest}.parquet"
+        )
+        if os.path.exists(cache_path):
+            return pd.read_parquet(cache_path)
+
+        df = pd.read_csv(csv_path)
+
+        # Filter Germany only
+        df = df[df["Country"].str.contains("Germany", case=False, na=False)]
+
+        # Rows without a power rating never pass the HDV filters
+        df = df.dropna(subset=["Power_kW"])
+
+        # Nor do fractional or out-of-int16 ratings (the valid power levels
+        # are whole kW); drop them so the cast below cannot turn e.g.
+        # 350.7 into an accepted 350, or wrap large values
+        power = df["Power_kW"]
+        df = df[(power == power.round()) & power.between(-32768, 32767)]
+
+        # Compact dtypes: half-width coordinates, small ints, string codes
+        dtypes = {
+            "Latitude": "float32",
+            "Longitude": "float32",
+            "Power_kW": "int16",
+            "Country": "category",
+        }
+        if "Operator" in df.columns:
+            dtypes["Operator"] = "category"
+        df = df.astype(dtypes)
+
+        try:
+            df.to_parquet(cache_path, compression="zstd")
+        except (ImportError, OSError):
+            pass  # cache is best-effort; the CSV remains the source of truth
+        return df
+
     # ===============================================================
     # SNAP STATIONS TO OSMNX NODES
     # ===============================================================
@@ -86,14 +162,12 @@ class ChargingStationManager:
         if self.stations is None:
             raise ValueError("Stations not loaded. Run load_eafo_dataset() first.")
 
-        station_nodes = []
-        for _, row in self.stations.iterrows():
-            node_id = ox.nearest_nodes(
-                self.graph, row.geometry.x, row.geometry.y
-            )
-            station_nodes.append(node_id)
+        # One batched query against the cached node index
+        if self._node_index is None or self._node_index.graph is not self.graph:
+            self._node_index = NearestNodeIndex(self.graph)
+        node_ids = self._node_index.nearest_nodes(self.stations_lat, self.stations_lon)
 
-        self.stations["node_id"] = station_nodes
+        self.stations["node_id"] = node_ids
         return self.stations
 
     # ===============================================================
@@ -112,44 +186,78 @@ class ChargingStationManager:
         Returns:
             charging time in minutes
         """
+        return self._charging_time_cached(
+            int(round(soc_initial * _SOC_CACHE_STEPS)),
+            int(round(soc_target * _SOC_CACHE_STEPS)),
+            charger_power_kw
+        )
 
-        if soc_target <= soc_initial:
-            return 0.0
+    def _charging_time_quantised(self, soc_initial_q, soc_target_q, charger_power_kw):
+        """
+        Charging time for SOC values quantised to 1/_SOC_CACHE_STEPS.
 
-        soc1 = soc_initial
-        soc2 = soc_target
+        Memoised per manager; the battery and charger parameters are
+        assumed not to change after construction.
+        """
+        soc_initial = soc_initial_q / _SOC_CACHE_STEPS
+        soc_target = soc_target_q / _SOC_CACHE_STEPS
 
-        # ----- PHASE 1: Constant Current (fast charging) -----
-        cc_limit = self.cc_cutoff_soc
+        curve = self._inv_curve.get(charger_power_kw)
+        if curve is None:
+            # Non-standard charger rating: evaluate the model directly
+            return float(self.charging_time_minutes_batch(
+                soc_initial, soc_target, charger_power_kw
+            ))
 
-        if soc1 < cc_limit:
-            soc_cc_end = min(soc2, cc_limit)
+        soc_grid, t_grid = curve
+        minutes = np.interp(soc_target, soc_grid, t_grid) - np.interp(soc_initial, soc_grid, t_grid)
+        return max(0.0, float(minutes))
 
-            energy_added_kwh = (soc_cc_end - soc1) * self.battery_capacity_kwh
+    def _build_charge_curves(self, n_points=256):
+        """
+        Tabulate the cumulative charging time from 0 SOC for every valid
+        power level, so a session is two np.interp lookups.
 
-            time_hours_cc = energy_added_kwh / (charger_power_kw * self.cc_efficiency)
-        else:
-            time_hours_cc = 0
+        The CC cutoff is inserted as an explicit breakpoint, which makes
+        the interpolation exact for the piecewise-linear CC–CV model;
+        a non-linear CV curve can be tabulated on the same grid.
+        """
+        soc_grid = np.union1d(np.linspace(0.0, 1.0, n_points), [self.cc_cutoff_soc])
+        return {
+            p_kw: (soc_grid, self.charging_time_minutes_batch(0.0, soc_grid, p_kw))
+            for p_kw in self.valid_power_levels_kw
+        }
 
-        # ----- PHASE 2: Constant Voltage (tapering) -----
-        if soc2 > cc_limit:
-            soc2_cv = soc2
-            soc1_cv = max(soc1, cc_limit)
+    def charging_time_minutes_batch(self, soc_initial, soc_target, charger_power_kw):
+        """
+        Vectorised charging_time_minutes over arrays of charging decisions.
 
-            # CV phase much slower (current tapers linearly)
-            energy_added_kwh_cv = (soc2_cv - soc1_cv) * self.battery_capacity_kwh
+        The CC and CV phase energies are obtained by clipping the SOC
+        interval at the CC cutoff, so no per-element branching is needed.
+        Inputs broadcast against each other; targets below the initial
+        SOC yield zero minutes.
 
-            # Approximate average power = 40% of charger rating
-            average_cv_power = charger_power_kw * 0.40
+        Returns:
+            NumPy array of charging times in minutes
+        """
+        soc_i = np.asarray(soc_initial, dtype=np.float64)
+        soc_t = np.asarray(soc_target, dtype=np.float64)
+        p_kw = np.asarray(charger_power_kw, dtype=np.float64)
+        cc_limit = self.cc_cutoff_soc
+        batt = self.battery_capacity_kwh
 
-            time_hours_cv = energy_added_kwh_cv / (average_cv_power * self.cv_efficiency)
-        else:
-            time_hours_cv = 0
+        # ----- PHASE 1: Constant Current (fast charging) -----
+        soc_cc_end = np.minimum(soc_t, cc_limit)
+        e_cc = np.maximum(0.0, soc_cc_end - soc_i) * batt
+        t_cc = e_cc / (p_kw * self.cc_efficiency)
 
-        total_hours = time_hours_cc + time_hours_cv
-        total_minutes = total_hours * 60
+        # ----- PHASE 2: Constant Voltage (tapering) -----
+        # Approximate average CV power = 40% of charger rating
+        soc1_cv = np.maximum(soc_i, cc_limit)
+        e_cv = np.maximum(0.0, soc_t - soc1_cv) * batt
+        t_cv = e_cv / (0.40 * p_kw * self.cv_efficiency)
 
-        return total_minutes
+        return (t_cc + t_cv) * 60.0
 
     # ===============================================================
     # VALID STATIONS QUERY
@@ -163,25 +271,35 @@ class ChargingStationManager:
         if self.stations is None:
             raise ValueError("Stations not loaded.")
 
-        # Route → GeoSeries of points
-        route_lats = []
-        route_lons = []
-        for node in path_nodes:
-            lat = self.graph.nodes[node]["y"]
-            lon = self.graph.nodes[node]["x"]
-            route_lats.append(lat)
-            route_lons.append(lon)
-
-        route_gdf = gpd.GeoDataFrame(
-            geometry=gpd.points_from_xy(route_lons, route_lats),
-            crs="EPSG:4326"
-        )
+        # Route → (lat, lon) array in a single gather over node attributes
+        node_data = self.graph.nodes
+        route = np.array(
+            [(node_data[node]["y"], node_data[node]["x"]) for node in path_nodes],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        route_lats, route_lons = route[:, 0], route[:, 1]
+
+        if len(route_lats) == 0:
+            return self.stations.iloc[0:0]
+
+        # Typical routes: one dense haversine, no geometry objects at all
+        if len(route_lats) * len(self.stations_lat) <= _HAVERSINE_MAX_PAIRS:
+            dist_km = haversine_km(
+                route_lats[:, None], route_lons[:, None],
+                self.stations_lat[None, :], self.stations_lon[None, :]
+            )
+            return self.stations[dist_km.min(axis=0) <= buffer_km]
 
-        # Route buffer
-        route_buffer = route_gdf.unary_union.buffer(buffer_km / 111)  # deg ~ km
+        # Large inputs: haversine BallTree over the route points, so both
+        # branches apply the same great-circle distance test
+        from sklearn.neighbors import BallTree
 
-        # Spatial filter
-        nearby = self.stations[self.stations.geometry.within(route_buffer)]
+        route_tree = BallTree(np.radians(route), metric="haversine")
+        station_rad = np.radians(np.column_stack((self.stations_lat, self.stations_lon)))
+        hits = route_tree.query_radius(
+            station_rad, r=buffer_km / EARTH_RADIUS_KM, count_only=True
+        )
+        nearby = self.stations[hits > 0]
 
         return nearby
 
@@ -0,0 +1,100 @@
+# ===============================================================
+# edge_table.py
+# Edge attributes of the road graph as contiguous arrays (SoA)
+# ===============================================================
+
+from dataclasses import dataclass
+
+import numpy as np
+
+KMH_TO_MPS = 1000.0 / 3600.0
+
+
+@dataclass
+class EdgeTable:
+    """
+    Structure-of-arrays view of the graph edges.
+
+    Row i describes edge (node_ids[u[i]], node_ids[v[i]], key) where
+    index maps that (u, v, key) triple of graph node ids back to i; on
+    an undirected graph (v, u, key) maps to the same row.
+    Consumers turn a path into a row-index array once and slice the
+    attribute arrays instead of walking per-edge dicts.
+    """
+    node_ids: np.ndarray        # node position → graph node id
+    u: np.ndarray               # int32 source node position
+    v: np.ndarray               # int32 target node position
+    length_m: np.ndarray        # float32
+    speed_kph: np.ndarray       # float32
+    speed_mps: np.ndarray       # float32
+    grade: np.ndarray           # float32
+    index: dict                 # (u, v, key) → row
+    travel_time_h: np.ndarray = None  # float32, once travel times are set
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Build the table from a graph whose edges carry length and
+        speed_kph (grade defaults to 0; speed_mps to the converted
+        speed_kph). travel_time_h is taken over when every edge has it.
+        Edges of a simple graph get key 0.
+        """
+        node_ids = np.empty(graph.number_of_nodes(), dtype=object)
+        node_ids[:] = list(graph.nodes)
+        position = {n: i for i, n in enumerate(node_ids)}
+
+        if graph.is_multigraph():
+            rows = list(graph.edges(keys=True, data=True))
+        else:
+            rows = [(u, v, 0, data) for u, v, data in graph.edges(data=True)]
+        n = len(rows)
+
+        travel_time_h = None
+        if n and all("travel_time_h" in r[3] for r in rows):
+            travel_time_h = np.fromiter(
+                (r[3]["travel_time_h"] for r in rows), dtype=np.float32, count=n
+            )
+
+        index = {(u, v, k): i for i, (u, v, k, _) in enumerate(rows)}
+        if not graph.is_directed():
+            # Paths may traverse an undirected edge either way
+            index.update({(v, u, k): i for i, (u, v, k, _) in enumerate(rows)})
+
+        return cls(
+            node_ids=node_ids,
+            u=np.fromiter((position[r[0]] for r in rows), dtype=np.int32, count=n),
+            v=np.fromiter((position[r[1]] for r in rows), dtype=np.int32, count=n),
+            length_m=np.fromiter((r[3]["length"] for r in rows), dtype=np.float32, count=n),
+            speed_kph=np.fromiter((r[3]["speed_kph"] for r in rows), dtype=np.float32, count=n),
+            speed_mps=np.fromiter(
+                (r[3].get("speed_mps", r[3]["speed_kph"] * KMH_TO_MPS) for r in rows),
+                dtype=np.float32, count=n
+            ),
+            grade=np.fromiter((r[3].get("grade", 0.0) for r in rows), dtype=np.float32, count=n),
+            index=index,
+            travel_time_h=travel_time_h,
+        )
+
+    def __len__(self):
+        return len(self.length_m)
+
+    def time_h(self):
+        """
+        Travel time per edge in hours: travel_time_h when set, otherwise
+        length / speed.
+        """
+        if self.travel_time_h is not None:
+            return self.travel_time_h
+        return (self.length_m.astype(np.float64) / 1000) / self.speed_kph
+
+    def path_edges(self, path_nodes):
+        """
+        Row indices of the edges along a node path, taking key 0 for
+        every hop as get_edge_data(u, v)[0] does.
+        """
+        index = self.index
+        return np.fromiter(
+            (index[(u, v, 0)] for u, v in zip(path_nodes[:-1], path_nodes[1:])),
+            dtype=np.int64,
+            count=max(len(path_nodes) - 1, 0)
+        )
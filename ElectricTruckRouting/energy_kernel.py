@@ -0,0 +1,62 @@
+# ===============================================================
+# energy_kernel.py
+# Compiled per-edge energy kernels for the electric truck model
+# ===============================================================
+
+import numpy as np
+from numba import njit, prange, float64
+
+
+@njit(cache=True, fastmath=True)
+def segment_energy_kwh(distance_m, speed_mps, gradient,
+                       drivetrain_eff, regen_eff, mass_kg,
+                       rolling_res_coeff, air_density,
+                       drag_coefficient, frontal_area, aux_load_kw):
+    """
+    Energy for a single segment; same physics as
+    ElectricTruckModel.segment_energy_kwh.
+    """
+    g = 9.81
+    P_roll = rolling_res_coeff * mass_kg * g * speed_mps
+    P_drag = 0.5 * air_density * drag_coefficient * frontal_area * speed_mps**3
+    P_climb = mass_kg * g * gradient * speed_mps
+    P_aux = aux_load_kw * 1000
+
+    P_total = P_roll + P_drag + P_climb + P_aux
+    time_sec = distance_m / speed_mps
+    E_mech_wh = (P_total * time_sec) / 3600 * 1000
+
+    if E_mech_wh >= 0:
+        E_elec_wh = E_mech_wh / drivetrain_eff
+    else:
+        E_elec_wh = E_mech_wh * regen_eff
+
+    return E_elec_wh / 1000
+
+
+# Compiled eagerly at import (and cached on disk) so the first route
+# evaluation does not pay the JIT latency.
+@njit(
+    float64[:](float64[:], float64[:], float64[:],
+               float64, float64, float64, float64, float64,
+               float64, float64, float64, float64),
+    cache=True, fastmath=True, parallel=True
+)
+def compute_edges_energy(length_m, speed_mps, gradient,
+                         drivetrain_eff, regen_eff, mass_kg,
+                         rolling_res_coeff, air_density,
+                         drag_coefficient, frontal_area, aux_load_kw,
+                         temp_loss):
+    """
+    Energy in kWh for every edge of equal-length arrays, scaled by
+    temp_loss. Edges are independent, so the loop runs in parallel.
+    """
+    n = length_m.shape[0]
+    out = np.empty(n)
+    for i in prange(n):
+        out[i] = segment_energy_kwh(
+            length_m[i], speed_mps[i], gradient[i],
+            drivetrain_eff, regen_eff, mass_kg, rolling_res_coeff,
+            air_density, drag_coefficient, frontal_area, aux_load_kw
+        ) * temp_loss
+    return out
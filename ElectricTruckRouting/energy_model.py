@@ -6,6 +6,87 @@
 
 import numpy as np
 import math
+from numba import njit, prange
+
+from energy_kernel import compute_edges_energy
+from energy_kernel import segment_energy_kwh as _segment_energy_kwh_scalar
+
+
+# ===============================================================
+# COMPILED TRIP KERNELS
+# ===============================================================
+
+@njit(cache=True)
+def _temperature_loss_factor(temp_c):
+    """Same derating steps as ElectricTruckModel.apply_temperature_effect."""
+    if temp_c < 0:
+        return 1.15
+    elif temp_c < 10:
+        return 1.05
+    return 1.00
+
+
+@njit(cache=True, fastmath=True)
+def simulate_trip(distance_m, speed_mps, gradient, temp_c, soc_initial,
+                  drivetrain_eff, regen_eff, mass_kg, rolling_res_coeff,
+                  air_density, drag_coefficient, frontal_area, aux_load_kw,
+                  battery_kwh, min_soc):
+    """
+    Segment energies and SOC propagation fused into one pass.
+
+    Returns:
+        (energy_kwh per segment, SOC after each segment, feasible)
+        where feasible is False once SOC drops below min_soc.
+    """
+    n = distance_m.shape[0]
+    energies = np.empty(n)
+    soc = np.empty(n)
+    level = soc_initial
+    feasible = True
+    for i in range(n):
+        e = _segment_energy_kwh_scalar(
+            distance_m[i], speed_mps[i], gradient[i],
+            drivetrain_eff, regen_eff, mass_kg, rolling_res_coeff,
+            air_density, drag_coefficient, frontal_area, aux_load_kw
+        ) * _temperature_loss_factor(temp_c[i])
+        level -= e / battery_kwh
+        energies[i] = e
+        soc[i] = level
+        if level < min_soc:
+            feasible = False
+    return energies, soc, feasible
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def simulate_trips(offsets, distance_m, speed_mps, gradient, temp_c,
+                   soc_initial, drivetrain_eff, regen_eff, mass_kg,
+                   rolling_res_coeff, air_density, drag_coefficient,
+                   frontal_area, aux_load_kw, battery_kwh, min_soc):
+    """
+    simulate_trip for many candidate routes in parallel.
+
+    Segment arrays are the concatenation of all routes; route r spans
+    offsets[r]:offsets[r + 1]. The SOC chain within a route is
+    sequential, so parallelism is across routes.
+    """
+    n_routes = offsets.shape[0] - 1
+    energies = np.empty(distance_m.shape[0])
+    soc = np.empty(distance_m.shape[0])
+    feasible = np.empty(n_routes, dtype=np.bool_)
+    for r in prange(n_routes):
+        a = offsets[r]
+        b = offsets[r + 1]
+        e_r, soc_r, ok = simulate_trip(
+            distance_m[a:b], speed_mps[a:b], gradient[a:b], temp_c[a:b],
+            soc_initial, drivetrain_eff, regen_eff, mass_kg,
+            rolling_res_coeff, air_density, drag_coefficient,
+            frontal_area, aux_load_kw, battery_kwh, min_soc
+        )
+        energies[a:b] = e_r
+        soc[a:b] = soc_r
+        feasible[r] = ok
+    return energies, soc, feasible
+
 
 class ElectricTruckModel:
     """
@@ -73,34 +154,38 @@ class ElectricTruckModel:
         Returns:
             Energy in kWh (positive uphill, negative for regen)
         """
+        return _segment_energy_kwh_scalar(
+            float(distance_m), float(avg_speed_mps), float(gradient),
+            self.drivetrain_eff, self.regen_eff, self.mass_kg,
+            self.rolling_res_coeff, self.air_density,
+            self.drag_coefficient, self.frontal_area, self.aux_load_kw
+        )
+
+    def segment_energy_kwh_batch(self, distance_m, avg_speed_mps, gradient,
+                                 temp_loss=1.0):
+        """
+        Vectorised segment_energy_kwh for whole routes.
 
-        # Power contributions
-        P_roll = self.rolling_resistance_power(avg_speed_mps)
-        P_drag = self.aerodynamic_drag_power(avg_speed_mps)
-        P_climb = self.climbing_power(gradient, avg_speed_mps)
-
-        # Aux power
-        P_aux = self.aux_load_kw * 1000  # convert kW → W
-
-        # Total mechanical power
-        P_total = P_roll + P_drag + P_climb + P_aux
-
-        # Time to traverse segment
-        time_sec = distance_m / avg_speed_mps
-
-        # Mechanical energy
-        E_mech_wh = (P_total * time_sec) / 3600 * 1000  # Wh
-
-        # Apply drivetrain and regen efficiency
-        if E_mech_wh >= 0:
-            # Uphill / normal driving
-            E_elec_wh = E_mech_wh / self.drivetrain_eff
-        else:
-            # Negative energy → regen
-            E_elec_wh = E_mech_wh * self.regen_eff
+        Parameters:
+            - distance_m: array of segment lengths in meters
+            - avg_speed_mps: array (or scalar) of average speeds in m/s
+            - gradient: array (or scalar) of slopes
+            - temp_loss: multiplicative temperature derating factor
 
-        # Convert to kWh
-        return E_elec_wh / 1000
+        Returns:
+            NumPy array of energies in kWh, one per segment
+        """
+        distance_m, avg_speed_mps, gradient = (
+            np.ascontiguousarray(a, dtype=np.float64)
+            for a in np.broadcast_arrays(distance_m, avg_speed_mps, gradient)
+        )
+        return compute_edges_energy(
+            distance_m.ravel(), avg_speed_mps.ravel(), gradient.ravel(),
+            self.drivetrain_eff, self.regen_eff, self.mass_kg,
+            self.rolling_res_coeff, self.air_density,
+            self.drag_coefficient, self.frontal_area, self.aux_load_kw,
+            float(temp_loss)
+        )
 
     # ===============================================================
     # SOC UPDATE
@@ -149,6 +234,44 @@ class ElectricTruckModel:
         base_energy = self.segment_energy_kwh(edge_length_m, speed_mps, gradient)
         return base_energy * self.temperature_loss_factor
 
+    def compute_edge_energy_vec(self, edge_length_m, speed_mps, gradient, temp_c=15):
+        """
+        Array version of compute_edge_energy for all edges of a route.
+        """
+        self.apply_temperature_effect(temp_c)
+
+        return self.segment_energy_kwh_batch(
+            edge_length_m, speed_mps, gradient,
+            temp_loss=self.temperature_loss_factor
+        )
+
+    def simulate_trip(self, distance_m, speed_mps, gradient, temp_c=15,
+                      soc_initial=None):
+        """
+        Energy and SOC along a route in one compiled pass.
+
+        Parameters:
+            - distance_m, speed_mps, gradient, temp_c: per-segment arrays
+              (scalars broadcast)
+            - soc_initial: starting SOC [0–1], defaults to max_soc
+
+        Returns:
+            (energy_kwh array, SOC-after-segment array, feasible flag)
+        """
+        if soc_initial is None:
+            soc_initial = self.max_soc
+        distance_m, speed_mps, gradient, temp_c = (
+            np.ascontiguousarray(a, dtype=np.float64).ravel()
+            for a in np.broadcast_arrays(distance_m, speed_mps, gradient, temp_c)
+        )
+        return simulate_trip(
+            distance_m, speed_mps, gradient, temp_c, float(soc_initial),
+            self.drivetrain_eff, self.regen_eff, self.mass_kg,
+            self.rolling_res_coeff, self.air_density,
+            self.drag_coefficient, self.frontal_area, self.aux_load_kw,
+            float(self.battery_capacity_kwh), self.min_soc
+        )
+
 
 # -----------------------------------------------------------------
 # Compatibility wrapper expected by the project's `main.py` script
@@ -172,6 +295,10 @@ class EnergyModel(ElectricTruckModel):
         self.drivetrain_eff = drivetrain_eff
         # A simple default consumption per km used by the lightweight optimizer
         self.consumption_kwh_per_km = 1.45
+        # (u, v) -> edge length cache, rebuilt when the graph changes
+        self._edge_lengths = {}
+        self._edge_lengths_graph = None
+        self._edge_lengths_key = None
 
     def compute_route_energy(self, path_nodes, graph=None):
         """Compute route energy in kWh for a list of ordered nodes.
@@ -182,13 +309,11 @@ class EnergyModel(ElectricTruckModel):
         """
         total_m = 0.0
         if graph is not None:
-            for i in range(len(path_nodes)-1):
-                u, v = path_nodes[i], path_nodes[i+1]
-                data = graph.get_edge_data(u, v)
-                if data is None:
-                    continue
-                first = list(data.values())[0]
-                total_m += first.get('length', 1000.0)
+            edge_lengths = self._edge_lengths_for(graph)
+            get_length = edge_lengths.get
+            total_m = sum(
+                get_length(uv, 0.0) for uv in zip(path_nodes, path_nodes[1:])
+            )
         else:
             # fallback: assume 100 km between each node
             total_m = 1000.0 * max(1, len(path_nodes)-1)
@@ -196,3 +321,31 @@ class EnergyModel(ElectricTruckModel):
         km = total_m / 1000.0
         energy = km * self.consumption_kwh_per_km
         return km, energy
+
+    def _edge_lengths_for(self, graph):
+        """Return a {(u, v): length_m} table for graph.
+
+        The table is built once per graph and reused for every route
+        evaluation; it is rebuilt when a different graph object is passed
+        or its edge count changes. Edits to edge lengths on the same graph
+        are not detected. For parallel edges the first edge is used,
+        matching the previous get_edge_data()-based lookup; undirected
+        graphs get both (u, v) and (v, u).
+        """
+        key = graph.number_of_edges()
+        if self._edge_lengths_graph is not graph or self._edge_lengths_key != key:
+            if graph.is_multigraph():
+                self._edge_lengths = {
+                    (u, v): next(iter(keydict.values())).get('length', 1000.0)
+                    for u, nbrs in graph.adj.items()
+                    for v, keydict in nbrs.items()
+                }
+            else:
+                self._edge_lengths = {
+                    (u, v): data.get('length', 1000.0)
+                    for u, nbrs in graph.adj.items()
+                    for v, data in nbrs.items()
+                }
+            self._edge_lengths_graph = graph
+            self._edge_lengths_key = key
+        return self._edge_lengths
@@ -1,19 +1,27 @@
 # ==========================================================
 # Electric Truck Routing Model: Hamburg → Munich
 # Full Germany OSM Routing + Battery Constraints + Charging
-# Multi-objective optimization using Pyomo
+# Multi-objective optimization as a linear program (SciPy/HiGHS)
 # ==========================================================
 # Required pip installs:
-# pip install osmnx pyomo networkx numpy pandas shapely matplotlib geopy
+# pip install osmnx networkx numpy pandas shapely matplotlib scipy pyproj scikit-learn
 # ==========================================================
 
+import hashlib
+import os
+import pickle
+
 import osmnx as ox
 import networkx as nx
 import numpy as np
 import pandas as pd
-import pyomo.environ as pyo
+import shapely
 import matplotlib.pyplot as plt
-from geopy.distance import geodesic
+from pyproj import Transformer
+from scipy.optimize import linprog
+from scipy.spatial import cKDTree
+
+from geo_utils import NearestNodeIndex, haversine_km
 
 # ==========================================================
 # 1. INPUTS & ASSUMPTIONS (Imagined / Realistic)
@@ -42,6 +50,32 @@ CHARGING_STATIONS = [
     (49.4521, 11.0767, 350),  # Nuremberg
 ]
 
+# On-disk cache for geocoding and baseline path between runs
+CACHE_DIR = "cache"
+
+# OSMnx caches Overpass/Nominatim HTTP responses itself
+ox.settings.use_cache = True
+ox.settings.log_console = False
+
+
+def cached(filename, compute):
+    """Return the pickled result in CACHE_DIR, computing and storing it on a miss."""
+    path = os.path.join(CACHE_DIR, filename)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    result = compute()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return result
+
+
+def geocode(query):
+    """ox.geocode with the (lat, lon) result cached on disk per query string."""
+    key = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    return cached(f"geocode_{key}.pkl", lambda: ox.geocode(query))
+
 
 # ==========================================================
 # 2. DOWNLOAD GERMANY ROAD NETWORK USING OSMnx
@@ -65,11 +99,12 @@ G = ox.utils_graph.get_undirected(G)
 
 print(f"Locating origin ({ORIGIN}) and destination ({DESTINATION})...")
 
-origin_point = ox.geocode(ORIGIN)
-destination_point = ox.geocode(DESTINATION)
+origin_point = geocode(ORIGIN)
+destination_point = geocode(DESTINATION)
 
-origin_node = ox.nearest_nodes(G, origin_point[1], origin_point[0])
-destination_node = ox.nearest_nodes(G, destination_point[1], destination_point[0])
+node_index = NearestNodeIndex(G)
+origin_node = node_index.nearest_node(*origin_point)
+destination_node = node_index.nearest_node(*destination_point)
 
 
 # ==========================================================
@@ -77,10 +112,22 @@ destination_node = ox.nearest_nodes(G, destination_point[1], destination_point[0
 # ==========================================================
 
 print("Computing baseline shortest path...")
-baseline_route = nx.shortest_path(G, origin_node, destination_node, weight="length")
-baseline_length_km = sum(
-    ox.utils_graph.get_route_edge_attributes(G, baseline_route, "length")
-) / 1000
+baseline_route = cached(
+    f"path_{origin_node}_{destination_node}.pkl",
+    lambda: nx.shortest_path(G, origin_node, destination_node, weight="length")
+)
+
+# Edge data of every hop; the shortest of any parallel edges is the one
+# Dijkstra used. G[u][v] works in either travel direction on the
+# undirected graph, unlike a (u, v, key) lookup in its edge GeoDataFrame
+route_edges = [
+    min(G[u][v].values(), key=lambda data: data["length"])
+    for u, v in zip(baseline_route[:-1], baseline_route[1:])
+]
+
+baseline_length_km = np.fromiter(
+    (data["length"] for data in route_edges), dtype=float, count=len(route_edges)
+).sum() / 1000
 
 print(f"Baseline distance: {baseline_length_km:.1f} km")
 
@@ -90,14 +137,11 @@ print(f"Baseline distance: {baseline_length_km:.1f} km")
 # ==========================================================
 
 # Extract coordinates of baseline route
-route_coords = ox.utils_graph.get_route_edge_attributes(G, baseline_route, "geometry")
+route_coords = [data.get("geometry") for data in route_edges]
 
-route_points = []
-for geom in route_coords:
-    if geom is None:
-        continue
-    for x, y in geom.coords:
-        route_points.append((y, x))  # (lat, lon)
+# All vertices of all edge geometries as one (M, 2) array (missing skipped)
+coords = shapely.get_coordinates(route_coords)
+route_points = coords[:, ::-1]  # (lat, lon)
 
 # Reduce points for computational feasibility
 ROUTE_STEP = 20
@@ -110,17 +154,11 @@ print(f"Optimized routing will use {N} discretized waypoints.")
 # ==========================================================
 # 6. BUILD OPTIMIZATION MODEL
 # ==========================================================
-
-model = pyo.ConcreteModel()
-
-# Sets
-model.N = pyo.RangeSet(0, N - 1)
-
-# SOC at each waypoint
-model.soc = pyo.Var(model.N, bounds=(SOC_MIN, SOC_MAX))
-
-# Charging decision variable (kWh charged)
-model.charge = pyo.Var(model.N, domain=pyo.NonNegativeReals)
+# With energy use fixed, the SOC at waypoint i is an affine function of
+# the charging decisions:
+#     soc[i] = SOC_MAX - sum(energy_use[:i]) + sum(charge[:i])
+# so the SOC variables and their chained equalities are substituted out
+# and the SOC bounds become cumulative inequalities A @ charge <= b.
 
 # Objective weights (multi-objective scalarization)
 w_energy = 0.40
@@ -131,63 +169,74 @@ w_emissions = 0.30
 # ENERGY CONSUMPTION ON ROUTE
 # ----------------------------------------------------------
 
-distances = []
-for i in range(N - 1):
-    distances.append(
-        geodesic(route_points[i], route_points[i+1]).km
-    )
-distances.append(0)
-
-energy_use = [d * CONSUMPtiON_KWH_PER_KM for d in distances]
+rp = np.asarray(route_points)
+distances = haversine_km(rp[:-1, 0], rp[:-1, 1], rp[1:, 0], rp[1:, 1])
+distances = np.append(distances, 0.0)
 
+energy_use = distances * CONSUMPTION_KWH_PER_KM
+total_energy_const = float(energy_use.sum())
 
 # ----------------------------------------------------------
-# OBJECTIVE FUNCTION
+# CHARGING LOCATIONS
 # ----------------------------------------------------------
 
-def objective_rule(model):
-    total_energy = sum(energy_use[i] for i in model.N)
-    total_charging_cost = sum(model.charge[i] * ELECTRICITY_PRICE for i in model.N)
-    total_co2 = sum(model.charge[i] * GERMAN_GRID_CO2 for i in model.N)
+# Charging only at station coordinates (mock rule)
+# Nearest-station distance per waypoint from a KD-tree in metric coordinates
+to_metric = Transformer.from_crs("EPSG:4326", "EPSG:3035", always_xy=True)
+cs = np.array([(c[0], c[1]) for c in CHARGING_STATIONS])
+cs_xy = np.column_stack(to_metric.transform(cs[:, 1], cs[:, 0]))
+rp_xy = np.column_stack(to_metric.transform(rp[:, 1], rp[:, 0]))
+nearest_m, _ = cKDTree(cs_xy).query(rp_xy, k=1)
+allow_charge = nearest_m <= 5000  # must be within 5 km of station
+
+# Charging decision variables (kWh charged) exist only where allowed
+charge_idx = np.flatnonzero(allow_charge)
+K = len(charge_idx)
 
-    return (w_energy * total_energy +
-            w_time * sum(model.charge[i] / MAX_CHARGE_POWER_KW for i in model.N) +
-            w_emissions * total_co2)
+# ----------------------------------------------------------
+# OBJECTIVE FUNCTION
+# ----------------------------------------------------------
 
-model.obj = pyo.Objective(rule=objective_rule, sense=pyo.minimize)
+# Every charged kWh costs the same, so the time and emission terms fold
+# into one coefficient; w_energy * total_energy_const does not depend on
+# the decisions and is added back after solving
+charge_coeff = w_time / MAX_CHARGE_POWER_KW + w_emissions * GERMAN_GRID_CO2
+c = np.full(K, charge_coeff)
 
 # ----------------------------------------------------------
 # CONSTRAINTS
 # ----------------------------------------------------------
 
-# SOC dynamics
-def soc_rule(model, i):
-    if i == 0:
-        return model.soc[i] == SOC_MAX
-    return model.soc[i] == model.soc[i-1] - energy_use[i-1] + model.charge[i-1]
-
-model.soc_constraint = pyo.Constraint(model.N, rule=soc_rule)
+# Energy consumed before reaching each waypoint
+cum_energy = np.concatenate(([0.0], np.cumsum(energy_use)[:-1]))
 
-# Charging only at station coordinates (mock rule)
-def charging_station_rule(model, i):
-    lat, lon = route_points[i]
-    dmin = min(
-        geodesic((lat, lon), (cs[0], cs[1])).km
-        for cs in CHARGING_STATIONS
-    )
-    if dmin > 5:  # must be within 5 km of station
-        return model.charge[i] == 0
-    return pyo.Constraint.Skip
+# A[i, k] = 1 when the charge at waypoint charge_idx[k] precedes waypoint i
+A = (charge_idx[None, :] < np.arange(N)[:, None]).astype(float)
 
-model.charging_station_constraints = pyo.Constraint(model.N, rule=charging_station_rule)
+# SOC_MIN <= SOC_MAX - cum_energy + A @ charge <= SOC_MAX
+A_ub = np.vstack((A, -A))
+b_ub = np.concatenate((cum_energy, SOC_MAX - SOC_MIN - cum_energy))
 
 
 # ==========================================================
 # 7. SOLVE MODEL
 # ==========================================================
 
-solver = pyo.SolverFactory("glpk")
-result = solver.solve(model, tee=True)
+charge = np.zeros(N)
+if K:
+    result = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=(0, None), method="highs")
+    print(result.message)
+    if not result.success:
+        # No feasible charging plan (e.g. an SOC bound cannot be met)
+        raise SystemExit(result.message)
+    charge[charge_idx] = result.x
+else:
+    print("No waypoint lies within 5 km of a charging station.")
+    if np.any(cum_energy > SOC_MAX - SOC_MIN):
+        raise SystemExit("Route cannot be completed without charging.")
+
+soc_vals = SOC_MAX - cum_energy + np.concatenate(([0.0], np.cumsum(charge)[:-1]))
+objective_value = w_energy * total_energy_const + charge_coeff * charge.sum()
 
 
 # ==========================================================
@@ -195,25 +244,23 @@ result = solver.solve(model, tee=True)
 # ==========================================================
 
 print("\n=== OPTIMIZED ROUTE RESULTS ===")
-total_energy = sum(energy_use)
-total_charging = sum(model.charge[i]() for i in model.N)
+total_energy = total_energy_const
+total_charging = charge.sum()
 
 print(f"Trip distance: {baseline_length_km:.2f} km")
 print(f"Total driving energy required: {total_energy:.1f} kWh")
 print(f"Total charging energy added: {total_charging:.1f} kWh")
+print(f"Objective value: {objective_value:.2f}")
 
 print("\nCharging stops:")
-for i in model.N:
-    if model.charge[i]() > 1:
-        lat, lon = route_points[i]
-        print(f"- Stop at ({lat:.4f}, {lon:.4f}) → charge {model.charge[i]():.1f} kWh")
+for i in np.flatnonzero(charge > 1):
+    lat, lon = route_points[i]
+    print(f"- Stop at ({lat:.4f}, {lon:.4f}) → charge {charge[i]:.1f} kWh")
 
 # ==========================================================
 # 9. PLOT SOC CURVE
 # ==========================================================
 
-soc_vals = [model.soc[i]() for i in model.N]
-
 plt.plot(soc_vals)
 plt.title("State of Charge Along Route")
 plt.xlabel("Waypoint index")
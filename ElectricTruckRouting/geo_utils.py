@@ -0,0 +1,57 @@
+# ===============================================================
+# geo_utils.py
+# Vectorised geographic helpers shared by the routing modules
+# ===============================================================
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km between points given in degrees.
+
+    Inputs follow NumPy broadcasting, so passing column vectors for
+    one side and row vectors for the other returns a full N×M
+    distance matrix in a single call.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class NearestNodeIndex:
+    """
+    Haversine BallTree over the nodes of a graph.
+
+    The tree is built once per graph, so origin/destination lookups and
+    batched station snapping all reuse it instead of rebuilding a
+    spatial index per call.
+    """
+
+    def __init__(self, graph):
+        # Only the spatial index needs scikit-learn; haversine_km does not
+        from sklearn.neighbors import BallTree
+
+        self.graph = graph
+        # object dtype keeps node ids as they are (no int/str coercion)
+        self.node_ids = np.empty(graph.number_of_nodes(), dtype=object)
+        self.node_ids[:] = list(graph.nodes)
+        node_data = graph.nodes
+        latlon = np.array([(node_data[n]["y"], node_data[n]["x"]) for n in self.node_ids])
+        self.tree = BallTree(np.radians(latlon), metric="haversine")
+
+    def nearest_node(self, lat, lon):
+        """Return the graph node closest to (lat, lon)."""
+        return self.nearest_nodes([lat], [lon])[0]
+
+    def nearest_nodes(self, lats, lons):
+        """Return the closest graph node for every (lat, lon) pair."""
+        if len(lats) == 0:
+            return []
+        query = np.radians(np.column_stack((lats, lons)))
+        _, idx = self.tree.query(query, k=1)
+        return self.node_ids[idx[:, 0]].tolist()
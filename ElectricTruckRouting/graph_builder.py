@@ -1,4 +1,7 @@
 import networkx as nx
+import numpy as np
+
+from geo_utils import haversine_km
 
 class RoadNetwork:
     """Lightweight RoadNetwork stub for compatibility with main.py
@@ -12,6 +15,12 @@ class RoadNetwork:
         self.G = nx.MultiDiGraph()
         self.custom_points = {}
 
+        # Cached node coordinate arrays for nearest-node searches
+        self._node_ids = None
+        self._node_lats = None
+        self._node_lons = None
+        self._node_count = None  # G.number_of_nodes() the cache matches
+
     def build_graph_with_chargers(self, chargers_df=None):
         # Synthetic nodes with approximate lat/lon
         nodes = {
@@ -53,36 +62,53 @@ class RoadNetwork:
         # fallback: return None
         return None
 
+    def _node_arrays(self):
+        """Return (ids, lats, lons) arrays, rebuilt when the node set changes."""
+        if self._node_count != self.G.number_of_nodes():
+            ids, lats, lons = [], [], []
+            for n, data in self.G.nodes(data=True):
+                n_lat = data.get('y')
+                n_lon = data.get('x')
+                if n_lat is None or n_lon is None:
+                    continue
+                ids.append(n)
+                lats.append(n_lat)
+                lons.append(n_lon)
+            self._node_ids = np.array(ids, dtype=object)
+            self._node_lats = np.array(lats, dtype=float)
+            self._node_lons = np.array(lons, dtype=float)
+            self._node_count = self.G.number_of_nodes()
+        return self._node_ids, self._node_lats, self._node_lons
+
     def add_custom_point(self, name, coords):
         # coords expected as (lat, lon)
         lat, lon = coords
         self.custom_points[name] = coords
-        self.G.add_node(name, x=lon, y=lat)
-
-        # Connect this custom point to the nearest existing city node
-        def haversine_km(a_lat, a_lon, b_lat, b_lon):
-            from math import radians, sin, cos, asin, sqrt
-            R = 6371.0
-            dlat = radians(b_lat - a_lat)
-            dlon = radians(b_lon - a_lon)
-            a = sin(dlat/2)**2 + cos(radians(a_lat))*cos(radians(b_lat))*sin(dlon/2)**2
-            c = 2 * asin(min(1, sqrt(a)))
-            return R * c
 
+        # Find the nearest existing node with one vectorised haversine
+        node_ids, node_lats, node_lons = self._node_arrays()
         nearest = None
         nearest_dist_km = float('inf')
-        for n, data in self.G.nodes(data=True):
-            if n == name:
-                continue
-            n_lat = data.get('y')
-            n_lon = data.get('x')
-            if n_lat is None or n_lon is None:
-                continue
-            dkm = haversine_km(lat, lon, n_lat, n_lon)
-            if dkm < nearest_dist_km:
-                nearest_dist_km = dkm
-                nearest = n
+        if len(node_ids):
+            d = haversine_km(lat, lon, node_lats, node_lons)
+            d[node_ids == name] = np.inf
+            k = int(np.argmin(d))
+            if np.isfinite(d[k]):
+                nearest = node_ids[k]
+                nearest_dist_km = float(d[k])
+
+        is_new = name not in self.G
+        self.G.add_node(name, x=lon, y=lat)
+        if is_new and self._node_count == self.G.number_of_nodes() - 1:
+            # Extend the cache in place instead of rebuilding it
+            self._node_ids = np.append(self._node_ids, np.array([name], dtype=object))
+            self._node_lats = np.append(self._node_lats, lat)
+            self._node_lons = np.append(self._node_lons, lon)
+            self._node_count += 1
+        else:
+            self._node_count = None  # coordinates changed: rebuild lazily
 
+        # Connect this custom point to the nearest existing city node
         if nearest is not None:
             # Add bidirectional short edges to connect custom point
             length_m = max(500.0, nearest_dist_km * 1000.0)
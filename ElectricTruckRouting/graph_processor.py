@@ -3,63 +3,115 @@
 # Build & preprocess Germany road network for routing
 # ===============================================================
 
+import hashlib
+import os
+import pickle
+
 import osmnx as ox
 import networkx as nx
 import numpy as np
 
+try:
+    import lz4.frame
+except ImportError:  # graph cache is optional
+    lz4 = None
+
+from edge_table import EdgeTable, KMH_TO_MPS
+from geo_utils import NearestNodeIndex
+
+# Germany road network download parameters
+_GRAPH_DOWNLOAD = {
+    "query": "Germany",
+    "network_type": "drive",
+    "simplify": True,
+    "retain_all": False,
+}
+
+# Keep only important highways for long-haul trucks
+_HIGHWAY_WHITELIST = [
+    "motorway", "motorway_link",
+    "trunk", "trunk_link",
+    "primary", "primary_link"
+]
+
+# Bump when the filtering or the cached graph layout changes
+_GRAPH_CACHE_VERSION = 1
+
+# Filtered Germany graph, reused across runs when lz4 is available; the
+# file name is keyed on the version, download parameters and whitelist
+_GRAPH_CACHE_KEY = repr(
+    (_GRAPH_CACHE_VERSION, sorted(_GRAPH_DOWNLOAD.items()), _HIGHWAY_WHITELIST)
+)
+GRAPH_CACHE_PATH = os.path.join(
+    "cache",
+    f"germany_highways.{hashlib.sha1(_GRAPH_CACHE_KEY.encode()).hexdigest()[:16]}.pkl.lz4"
+)
+
+
+def _first_highway(highway):
+    """
+    Primary highway tag per edge as a categorical; simplified edges
+    carry a list of tags, of which the first one is used.
+
+    Downstream tests and lookups then work on the small integer codes
+    rather than on per-edge strings.
+    """
+    return highway.map(lambda h: h[0] if isinstance(h, list) else h).astype("category")
+
 
 class GraphProcessor:
 
     def __init__(self):
         self.graph = None
+        self.edge_table = None  # EdgeTable, built by add_speed_and_gradient
+        self._node_index = None  # NearestNodeIndex over self.graph (lazy)
 
     # -----------------------------------------------------------
     # BUILD GERMANY GRAPH
     # -----------------------------------------------------------
 
-    def load_germany_graph(self):
+    def load_germany_graph(self, cache_path=GRAPH_CACHE_PATH):
         """
         Loads the road network of Germany using OSMnx.
         Filters to major roads to ensure tractability.
-        """
-
-        print("Downloading Germany road graph...")
 
-        G = ox.graph_from_place(
-            "Germany",
-            network_type="drive",
-            simplify=True,
-            retain_all=False
-        )
+        The filtered graph is stored at cache_path (LZ4-compressed pickle)
+        and loaded from there on later runs; pass cache_path=None to
+        always download.
+        """
 
-        print("Graph downloaded. Simplifying...")
+        use_cache = cache_path is not None and lz4 is not None
+        if use_cache and os.path.exists(cache_path):
+            print("Loading cached Germany road graph...")
+            with lz4.frame.open(cache_path, "rb") as f:
+                self.graph = pickle.load(f)
+            return self.graph
 
-        G = ox.simplify_graph(G)
+        print("Downloading Germany road graph...")
 
-        # Keep only important highways for long-haul trucks
-        highway_whitelist = [
-            "motorway", "motorway_link",
-            "trunk", "trunk_link",
-            "primary", "primary_link"
-        ]
+        G = ox.graph_from_place(**_GRAPH_DOWNLOAD)
 
-        G2 = ox.utils_graph.graph_from_gdfs(
-            *ox.graph_to_gdfs(G)
-        )
+        print("Graph downloaded. Filtering...")
 
-        edges_to_keep = []
-        for u, v, k, data in G.edges(keys=True, data=True):
-            hw = data.get("highway", "")
-            if isinstance(hw, list):
-                hw = hw[0]
+        # Whitelist filter as one column operation on the edge table
+        nodes, edges = ox.graph_to_gdfs(G, fill_edge_geometry=False)
+        highway = _first_highway(edges["highway"].fillna(""))
+        edges = edges[highway.isin(_HIGHWAY_WHITELIST).to_numpy()]
 
-            if hw in highway_whitelist:
-                edges_to_keep.append((u, v, k))
+        # Keep only nodes still touched by an edge, like edge_subgraph()
+        index = edges.index
+        used = index.get_level_values("u").union(index.get_level_values("v"))
+        nodes = nodes[nodes.index.isin(used)]
 
-        G = G.edge_subgraph(edges_to_keep).copy()
+        G = ox.utils_graph.graph_from_gdfs(nodes, edges, graph_attrs=G.graph)
 
         print("Filtered graph size:", len(G.nodes), "nodes,", len(G.edges), "edges")
 
+        if use_cache:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with lz4.frame.open(cache_path, "wb") as f:
+                pickle.dump(G, f, protocol=5)
+
         self.graph = G
         return G
 
@@ -70,10 +122,30 @@ class GraphProcessor:
     def add_speed_and_gradient(self):
         """
         Adds estimated speeds and gradient from elevation data.
+        Travel times are assigned together with the speeds.
         """
 
         print("Adding speed & elevation...")
 
+        self._finalize_edges()
+
+        # Elevation using OSMnx + SRTM
+        self.graph = ox.add_node_elevations_raster(
+            self.graph, "https://github.com/GeoTIFF/SRTM/raw/master/srtm_38_03.tif"
+        )
+        self.graph = ox.add_edge_grades(self.graph)
+
+        self.edge_table = EdgeTable.from_graph(self.graph)
+        self.edge_table.travel_time_h = self.edge_table.time_h().astype(np.float32)
+
+        return self.graph
+
+    def _finalize_edges(self):
+        """
+        Assign speed_kph, speed_mps and travel_time_h to every edge with
+        one edge-table pass and a single attribute write-back.
+        """
+
         # Speed assignment based on highway type
         speed_map = {
             "motorway": 90,
@@ -84,30 +156,43 @@ class GraphProcessor:
             "primary_link": 50,
         }
 
-        for u, v, data in self.graph.edges(data=True):
-            hw = data.get("highway", "primary")
-            if isinstance(hw, list):
-                hw = hw[0]
-            data["speed_kph"] = speed_map.get(hw, 60)
-
-        # Elevation using OSMnx + SRTM
-        self.graph = ox.add_node_elevations_raster(
-            self.graph, "https://github.com/GeoTIFF/SRTM/raw/master/srtm_38_03.tif"
+        edges = ox.graph_to_gdfs(self.graph, nodes=False, fill_edge_geometry=False)
+        highway = _first_highway(edges["highway"].fillna("primary"))
+        # Speed per category, gathered by code
+        speed_lut = np.array(
+            [speed_map.get(hw, 60) for hw in highway.cat.categories], dtype=np.float32
         )
-        self.graph = ox.add_edge_grades(self.graph)
-
-        return self.graph
+        speed_kph = speed_lut[highway.cat.codes.to_numpy()]
+        # m/s once here rather than per route segment
+        speed_mps = speed_kph.astype(np.float64) * KMH_TO_MPS
+        dist_km = edges["length"].fillna(1.0).to_numpy(dtype=np.float64) / 1000
+        time_h = dist_km / speed_kph
+
+        nx.set_edge_attributes(self.graph, {
+            edge: {"speed_kph": kph, "speed_mps": mps, "travel_time_h": t}
+            for edge, kph, mps, t in zip(
+                edges.index, speed_kph.tolist(), speed_mps.tolist(), time_h.tolist()
+            )
+        })
 
     # -----------------------------------------------------------
     # WEIGHT = DISTANCE / SPEED (TRAVEL TIME)
     # -----------------------------------------------------------
 
     def add_travel_time_weights(self):
-        for u, v, data in self.graph.edges(data=True):
-            dist_km = data.get("length", 1.0) / 1000
-            speed_h = data["speed_kph"]
-            time_h = dist_km / speed_h
-            data["travel_time_h"] = time_h
+        # Already done by add_speed_and_gradient; only fill in travel times
+        # for an edge table that lacks them
+        if self.edge_table is None:
+            self.edge_table = EdgeTable.from_graph(self.graph)
+        table = self.edge_table
+        if table.travel_time_h is not None:
+            return self.graph
+
+        time_h = table.time_h()
+        table.travel_time_h = time_h.astype(np.float32)
+        nx.set_edge_attributes(
+            self.graph, dict(zip(table.index, time_h.tolist())), "travel_time_h"
+        )
         return self.graph
 
     # -----------------------------------------------------------
@@ -118,6 +203,10 @@ class GraphProcessor:
         """
         Convert coordinates to graph nodes.
         """
-        orig = ox.nearest_nodes(self.graph, origin_lon, origin_lat)
-        dest = ox.nearest_nodes(self.graph, dest_lon, dest_lat)
+        # BallTree built once per graph; both endpoints in one query
+        if self._node_index is None or self._node_index.graph is not self.graph:
+            self._node_index = NearestNodeIndex(self.graph)
+        orig, dest = self._node_index.nearest_nodes(
+            [origin_lat, dest_lat], [origin_lon, dest_lon]
+        )
         return orig, dest
@@ -6,12 +6,16 @@
 # - CO2 emissions (indirect from grid mix)
 # ===============================================================
 
+import functools
+
 import numpy as np
 import networkx as nx
 
+from edge_table import EdgeTable
+
 class MultiObjectiveOptimizer:
 
-    def __init__(self, graph, truck, energy_eval):
+    def __init__(self, graph, truck, energy_eval, edge_table=None):
         self.graph = graph
         self.truck = truck
         self.energy_eval = energy_eval
@@ -19,6 +23,33 @@ class MultiObjectiveOptimizer:
         # German grid emission intensity (approx 2023)
         self.co2_intensity = 420  # gCO2/kWh
 
+        # Routes keyed on (origin, dest, weights rounded to 3 dp)
+        self._route_cache = functools.lru_cache(maxsize=4096)(
+            self._optimize_route_uncached
+        )
+
+        # Shared SoA edge table (e.g. GraphProcessor.edge_table)
+        if edge_table is None:
+            edge_table = EdgeTable.from_graph(graph)
+        self._use_edge_table(edge_table)
+
+    def _use_edge_table(self, edge_table):
+        self.edge_table = edge_table
+        self._table_graph = self.graph
+        self._table_key = (self.graph.number_of_nodes(), self.graph.number_of_edges())
+        # Per-edge travel time (h), resolved once rather than per path
+        self._tt = edge_table.time_h()
+        self._route_cache.cache_clear()
+
+    def _sync_edge_table(self):
+        # Rebuild the edge table (and drop cached routes) when the graph was
+        # replaced or has gained or lost nodes or edges since it was built
+        # (in-place edits of edge attributes are not detected)
+        graph = self.graph
+        key = (graph.number_of_nodes(), graph.number_of_edges())
+        if graph is not self._table_graph or key != self._table_key:
+            self._use_edge_table(EdgeTable.from_graph(graph))
+
     # -----------------------------------------------------------
     # WEIGHTED OBJECTIVE FUNCTION
     # -----------------------------------------------------------
@@ -31,26 +62,18 @@ class MultiObjectiveOptimizer:
         - CO2
         """
 
-        # Travel time
-        total_time = 0.0
-        for i in range(len(path_nodes) - 1):
-            u = path_nodes[i]
-            v = path_nodes[i + 1]
-            edge = self.graph.get_edge_data(u, v)[0]
-            total_time += edge["travel_time_h"]
+        # Travel time: one gather + reduction over the edge table
+        self._sync_edge_table()
+        idx = self.edge_table.path_edges(path_nodes)
+        total_time = float(self._tt[idx].sum(dtype=np.float64))
 
         # Energy use
         _, energy_kwh = self.energy_eval.compute_route_energy(path_nodes)
 
-        # Emissions
-        emissions = energy_kwh * self.co2_intensity / 1000  # kg CO2
-
-        # Weighted sum
-        cost = (
-            w_time * total_time +
-            w_energy * energy_kwh +
-            w_emissions * emissions
-        )
+        # Weighted sum; emissions (kg CO2) are energy × grid intensity,
+        # so their weight folds into the energy coefficient
+        energy_coeff = w_energy + w_emissions * self.co2_intensity / 1000
+        cost = w_time * total_time + energy_coeff * energy_kwh
 
         return cost
 
@@ -61,31 +84,40 @@ class MultiObjectiveOptimizer:
     def optimize_route(self, origin_node, dest_node, w_time, w_energy, w_emissions):
         """
         Use Dijkstra with edge weights computed from energy, time, etc.
+        Results are memoised on the rounded weight vector.
         """
-
-        def edge_weight(u, v, data):
-            dist_km = data["length"] / 1000
-            speed_h = data["speed_kph"]
-            time_h = dist_km / speed_h
-
-            # Energy approx (simplified)
-            energy_kwh = dist_km * 1.4  # fallback 1.4 kWh/km
-
-            emission_kg = energy_kwh * self.co2_intensity / 1000
-
-            # Weighted cost
-            return (
-                w_time * time_h +
-                w_energy * energy_kwh +
-                w_emissions * emission_kg
-            )
-
-        # Create weighted graph
-        G2 = self.graph.copy()
-        for u, v, k, data in G2.edges(keys=True, data=True):
-            data["weight"] = edge_weight(u, v, data)
-
-        # Compute shortest path on weighted graph
-        path = nx.shortest_path(G2, origin_node, dest_node, weight="weight")
-
-        return path
+        self._sync_edge_table()
+        return list(self._route_cache(
+            origin_node, dest_node,
+            round(w_time, 3), round(w_energy, 3), round(w_emissions, 3)
+        ))
+
+    def _optimize_route_uncached(self, origin_node, dest_node, w_time, w_energy, w_emissions):
+        # Weighted cost of every edge at once from the edge table
+        table = self.edge_table
+        dist_km = table.length_m.astype(np.float64) / 1000
+        time_h = dist_km / table.speed_kph
+
+        # Energy approx (simplified)
+        energy_kwh = dist_km * 1.4  # fallback 1.4 kWh/km
+
+        # Emissions are energy × grid intensity: fold their weight into
+        # the energy coefficient, leaving one two-term expression per edge
+        energy_coeff = w_energy + w_emissions * self.co2_intensity / 1000
+
+        edge_cost = (w_time * time_h + energy_coeff * energy_kwh).tolist()
+        index = table.index
+
+        # Weight callable instead of a weighted graph copy
+        if self.graph.is_multigraph():
+            def weight(u, v, d):
+                # Cheapest of the parallel edges, as with a 'weight' attribute
+                return min(edge_cost[index[u, v, k]] for k in d)
+        else:
+            def weight(u, v, d):
+                return edge_cost[index[u, v, 0]]
+
+        # Point-to-point query: search from both ends
+        _, path = nx.bidirectional_dijkstra(self.graph, origin_node, dest_node, weight=weight)
+
+        return tuple(path)
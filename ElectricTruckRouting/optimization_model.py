@@ -1,5 +1,153 @@
-import networkx as nx
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import matplotlib.pyplot as plt
+from numba import njit
+
+# Grid emission factor (kg CO2 per kWh); emissions are proportional to energy
+_CO2_KG_PER_KWH = 0.42
+
+# Worker pool shared by all optimizers' run_nsga calls; module-level so its
+# threads (and the Dijkstra buffers they hold) are reused across calls
+# without every optimizer owning threads of its own
+_NSGA_POOL = None
+_NSGA_POOL_LOCK = threading.Lock()
+
+
+def _nsga_pool():
+    global _NSGA_POOL
+    with _NSGA_POOL_LOCK:
+        if _NSGA_POOL is None:
+            _NSGA_POOL = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="nsga"
+            )
+        return _NSGA_POOL
+
+
+# Array-backed binary min-heap for the compiled Dijkstra: keys/items are
+# preallocated, size is threaded through explicitly
+@njit(cache=True)
+def _heap_push(keys, items, size, key, item):
+    i = size
+    keys[i] = key
+    items[i] = item
+    while i > 0:
+        parent = (i - 1) >> 1
+        if keys[parent] <= keys[i]:
+            break
+        keys[parent], keys[i] = keys[i], keys[parent]
+        items[parent], items[i] = items[i], items[parent]
+        i = parent
+    return size + 1
+
+
+@njit(cache=True)
+def _heap_pop(keys, items, size):
+    key = keys[0]
+    item = items[0]
+    size -= 1
+    keys[0] = keys[size]
+    items[0] = items[size]
+    i = 0
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and keys[child + 1] < keys[child]:
+            child += 1
+        if keys[i] <= keys[child]:
+            break
+        keys[child], keys[i] = keys[i], keys[child]
+        items[child], items[i] = items[i], items[child]
+        i = child
+    return key, item, size
+
+
+@njit(cache=True, nogil=True)
+def dijkstra_csr(indptr, indices, weights, src, dst, dist, pred, done, keys, items):
+    # Single-pair Dijkstra on a CSR graph; returns (distance, node index
+    # path) or (inf, empty path) when dst is unreachable. Runs without the
+    # GIL, so concurrent queries from threads execute in parallel.
+    # dist/pred/done (one slot per node) and the heap keys/items (one slot
+    # per edge + 1, as every push follows a strict improvement along one
+    # edge) are caller-owned work buffers, reset here and reused across calls
+    dist.fill(np.inf)
+    pred.fill(-1)
+    done.fill(False)
+
+    dist[src] = 0.0
+    size = _heap_push(keys, items, 0, 0.0, src)
+    while size > 0:
+        d, u, size = _heap_pop(keys, items, size)
+        if done[u]:
+            continue
+        done[u] = True
+        if u == dst:
+            break
+        for j in range(indptr[u], indptr[u + 1]):
+            v = indices[j]
+            nd = d + weights[j]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                size = _heap_push(keys, items, size, nd, v)
+
+    if dist[dst] == np.inf:
+        return np.inf, np.empty(0, dtype=np.int32)
+
+    count = 1
+    node = dst
+    while node != src:
+        node = pred[node]
+        count += 1
+    path = np.empty(count, dtype=np.int32)
+    node = dst
+    for i in range(count - 1, -1, -1):
+        path[i] = node
+        node = pred[node]
+    return dist[dst], path
+
+
+def _is_pareto_front_nd(obj):
+    # Non-dominated mask for an (N, M) objective matrix (minimisation);
+    # dominates[i, j] is True when solution i dominates solution j
+    dominates = (np.all(obj[:, None, :] <= obj[None, :, :], axis=2)
+                 & np.any(obj[:, None, :] < obj[None, :, :], axis=2))
+    return ~dominates.any(axis=0)
+
+
+def _non_dominated_ranks(obj):
+    # NSGA-II front index per solution (0 = Pareto front), peeling one
+    # front at a time off the remaining solutions
+    rank = np.empty(len(obj), dtype=np.int64)
+    remaining = np.arange(len(obj))
+    r = 0
+    while remaining.size:
+        front = _is_pareto_front_nd(obj[remaining])
+        rank[remaining[front]] = r
+        remaining = remaining[~front]
+        r += 1
+    return rank
+
+
+def _crowding_distance(obj):
+    # NSGA-II crowding distance: per objective, the normalised gap between
+    # each solution's sorted neighbours; boundary solutions get inf
+    n = len(obj)
+    if n <= 2:
+        return np.full(n, np.inf)
+    order = np.argsort(obj, axis=0)
+    sorted_obj = np.take_along_axis(obj, order, axis=0)
+    span = sorted_obj[-1] - sorted_obj[0]
+    gaps = (sorted_obj[2:] - sorted_obj[:-2]) / np.where(span > 0, span, 1.0)
+    contrib = np.zeros_like(obj, dtype=np.float64)
+    np.put_along_axis(contrib, order[1:-1], gaps, axis=0)
+    np.put_along_axis(contrib, order[[0, -1]], np.inf, axis=0)
+    return contrib.sum(axis=1)
+
 
 class ParetoSolution:
     def __init__(self, cost, energy, co2, path):
@@ -16,26 +164,130 @@ class MultiObjectiveOptimizer:
     """
 
     def __init__(self, graph, charger_mgr, energy_model):
-        # Accept either RoadNetwork wrapper or a raw networkx graph
+        # Accept either RoadNetwork wrapper or a raw networkx graph; it is
+        # re-read before every query, as the wrapper may still change
+        self._graph_source = graph
+        self.charger_mgr = charger_mgr
+        self.energy_model = energy_model
+        # Shortest paths keyed on (start, end, weights rounded to 3 dp)
+        self._shortest_path_cached = functools.lru_cache(maxsize=4096)(
+            self._shortest_path_uncached
+        )
+        self.G = None
+        self._graph_key = None
+        self._sync_graph()
+
+    def _sync_graph(self):
+        # Rebuild the derived tables when the graph was replaced or has
+        # gained/lost nodes or edges since they were built (in-place edits
+        # of edge attributes are not detected)
         try:
-            self.G = graph.get_graph()
+            G = self._graph_source.get_graph()
         except Exception:
             # assume graph is already a networkx graph
-            self.G = graph
-        self.charger_mgr = charger_mgr
-        self.energy_model = energy_model
+            G = self._graph_source
+        key = (G.number_of_nodes(), G.number_of_edges())
+        if G is self.G and key == self._graph_key:
+            return
+        self.G = G
+        self._graph_key = key
+        self._build_canonical_edges()
+        self._build_csr()
+        self._search_buffers = threading.local()
+        self._shortest_path_cached.cache_clear()
+
+    def _build_canonical_edges(self):
+        # One canonical edge per (u, v) pair, the first of any parallel edges
+        # as get_edge_data() lists them, with its length in a flat array
+        self._canonical_edge = {}
+        lengths = []
+        for u, nbrs in self.G.adj.items():
+            for v, keydict in nbrs.items():
+                self._canonical_edge[(u, v)] = len(lengths)
+                lengths.append(next(iter(keydict.values())).get('length', 1000.0))
+        self._edge_length = np.asarray(lengths, dtype=np.float64)
+
+    def _build_csr(self):
+        # Pack the graph into CSR arrays for dijkstra_csr: node ids map to
+        # 0..N-1 and every edge (parallel ones included) keeps its own
+        # (time_h, energy_kWh) row, computed once since it does not depend
+        # on the weight set; CO2 is folded into the energy weight
+        self._csr_nodes = np.empty(self.G.number_of_nodes(), dtype=object)
+        self._csr_nodes[:] = list(self.G.nodes)
+        self._csr_index = {n: i for i, n in enumerate(self._csr_nodes)}
+
+        both_ways = not self.G.is_directed()
+        src, dst, objectives = [], [], []
+        for u, v, data in self.G.edges(data=True):
+            dist_km = data.get('length', 1000.0) / 1000.0
+            speed = data.get('speed_kph', 100)
+            obj = (dist_km / speed, dist_km * 1.45)
+            src.append(self._csr_index[u])
+            dst.append(self._csr_index[v])
+            objectives.append(obj)
+            if both_ways:
+                src.append(self._csr_index[v])
+                dst.append(self._csr_index[u])
+                objectives.append(obj)
+
+        src = np.asarray(src, dtype=np.int32)
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=len(self._csr_nodes))
+        self._csr_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int32)
+        self._csr_indices = np.asarray(dst, dtype=np.int32)[order]
+        self._csr_objectives = np.asarray(objectives, dtype=np.float64).reshape(-1, 2)[order]
+
+    def _shortest_path_uncached(self, start_node, end_node, w_time, w_energy, w_em):
+        src = self._csr_index.get(start_node)
+        dst = self._csr_index.get(end_node)
+        if src is None or dst is None:
+            return ()
+        # Composite edge weights for this weight set: emissions are a fixed
+        # multiple of energy, so w_em folds into the energy coefficient
+        coeffs = np.array([w_time, w_energy + w_em * _CO2_KG_PER_KWH])
+        weights = self._csr_objectives @ coeffs
+        buf = self._dijkstra_buffers()
+        _, path = dijkstra_csr(
+            self._csr_indptr, self._csr_indices, weights, src, dst,
+            buf.dist, buf.pred, buf.done, buf.keys, buf.items
+        )
+        return tuple(self._csr_nodes[path].tolist())
+
+    def _dijkstra_buffers(self):
+        # Work arrays for dijkstra_csr, allocated once per thread and reset
+        # in place by each search instead of being reallocated
+        buf = self._search_buffers
+        if not hasattr(buf, 'dist'):
+            n_nodes = len(self._csr_nodes)
+            heap_size = len(self._csr_indices) + 1
+            buf.dist = np.empty(n_nodes)
+            buf.pred = np.empty(n_nodes, dtype=np.int32)
+            buf.done = np.empty(n_nodes, dtype=np.bool_)
+            buf.keys = np.empty(heap_size)
+            buf.items = np.empty(heap_size, dtype=np.int32)
+        return buf
+
+    def shortest_path(self, start_node, end_node, w_time, w_energy, w_em):
+        self._sync_graph()
+        return self._shortest_path(start_node, end_node, w_time, w_energy, w_em)
+
+    def _shortest_path(self, start_node, end_node, w_time, w_energy, w_em):
+        # Near-identical weight vectors collapse onto one cached Dijkstra run;
+        # callers sync the graph first
+        return list(self._shortest_path_cached(
+            start_node, end_node,
+            round(w_time, 3), round(w_energy, 3), round(w_em, 3)
+        ))
 
     def _path_metrics(self, path_nodes):
-        # Compute distance, energy, and simple CO2 metric
-        total_m = 0.0
-        for i in range(len(path_nodes) - 1):
-            u, v = path_nodes[i], path_nodes[i+1]
-            data = self.G.get_edge_data(u, v)
-            if data is None:
-                continue
-            # Get the first edge's data
-            first = list(data.values())[0]
-            total_m += first.get('length', 1000.0)
+        # Compute distance, energy, and simple CO2 metric; hops without an
+        # edge are skipped
+        canonical = self._canonical_edge
+        idx = np.fromiter(
+            (canonical[uv] for uv in zip(path_nodes, path_nodes[1:]) if uv in canonical),
+            dtype=np.int64
+        )
+        total_m = float(self._edge_length[idx].sum())
         km = total_m / 1000.0
         # Energy: use energy_model if it has a simple per-km method
         try:
@@ -44,9 +296,16 @@ class MultiObjectiveOptimizer:
             energy = km * 1.45
         # Cost (€/kWh assumed 0.32) and CO2 (kg, 0.42 kg/kWh)
         cost = energy * 0.32
-        co2 = energy * 0.42
+        co2 = energy * _CO2_KG_PER_KWH
         return cost, energy, co2
 
+    def _evaluate_individual(self, start_node, end_node, weights):
+        # Fitness of one weight set: its shortest path and that path's metrics
+        w_time, w_energy, w_em = weights
+        path = self._shortest_path(start_node, end_node, w_time, w_energy, w_em)
+        cost, energy, co2 = self._path_metrics(path)
+        return ParetoSolution(cost, energy, co2, path)
+
     def run_nsga(self, start, end, population=40, generations=20):
         # Build a small set of weight combinations to approximate Pareto front
         weight_sets = [
@@ -57,7 +316,9 @@ class MultiObjectiveOptimizer:
             (0.5, 0.25, 0.25)
         ]
 
-        solutions = []
+        # Pick up graph changes once, before the workers start
+        self._sync_graph()
+
         # Convert start/end node names to actual nodes if necessary
         if start in self.G.nodes:
             start_node = start
@@ -68,23 +329,13 @@ class MultiObjectiveOptimizer:
         else:
             end_node = end
 
-        # For each weight set, compute shortest path with a composed weight
-        for w_time, w_energy, w_em in weight_sets:
-            # Assign edge weights
-            G2 = self.G.copy()
-            for u, v, k, data in list(G2.edges(keys=True, data=True)):
-                dist_km = data.get('length', 1000.0) / 1000.0
-                speed = data.get('speed_kph', 100)
-                time_h = dist_km / speed
-                energy = dist_km * 1.45
-                em_kg = energy * 0.42
-                data['weight'] = w_time * time_h + w_energy * energy + w_em * em_kg
-            try:
-                path = nx.shortest_path(G2, start_node, end_node, weight='weight')
-            except Exception:
-                path = []
-            cost, energy, co2 = self._path_metrics(path)
-            solutions.append(ParetoSolution(cost, energy, co2, path))
+        # For each weight set, compute shortest path with a composed weight;
+        # the compiled Dijkstra releases the GIL, so threads share the CSR
+        # arrays and run the evaluations side by side on the shared pool
+        solutions = list(_nsga_pool().map(
+            lambda w: self._evaluate_individual(start_node, end_node, w),
+            weight_sets
+        ))
 
         # Deduplicate by path
         unique = {}
@@ -92,10 +343,23 @@ class MultiObjectiveOptimizer:
             key = tuple(s.path)
             if key not in unique:
                 unique[key] = s
-        return list(unique.values())
+        unique = list(unique.values())
+        if not unique:
+            return unique
+
+        # NSGA-II ordering: by front, then most isolated first within a front
+        obj = np.array([(s.cost, s.energy, s.co2) for s in unique], dtype=np.float64)
+        rank = _non_dominated_ranks(obj)
+        crowding = np.empty(len(unique))
+        for r in np.unique(rank):
+            in_front = rank == r
+            crowding[in_front] = _crowding_distance(obj[in_front])
+        order = np.lexsort((-crowding, rank))
+        return [unique[i] for i in order]
 
     def plot_routes(self, pareto_solutions):
         # Basic matplotlib plot showing node positions and route lines
+        self._sync_graph()
         plt.figure(figsize=(8,6))
         # plot nodes
         xs = [d.get('x', 0) for n, d in self.G.nodes(data=True)]
@@ -5,14 +5,51 @@
 
 import numpy as np
 
+from edge_table import EdgeTable
+from energy_kernel import compute_edges_energy
+
 
 class RouteEnergyEvaluator:
 
-    def __init__(self, graph, truck_model, charger_mgr):
+    def __init__(self, graph, truck_model, charger_mgr, edge_table=None):
         self.graph = graph
         self.truck = truck_model
         self.charger_mgr = charger_mgr
 
+        # Shared SoA edge table (e.g. GraphProcessor.edge_table)
+        if edge_table is None:
+            edge_table = EdgeTable.from_graph(graph)
+        self._use_edge_table(edge_table)
+
+        # Truck parameters as plain floats in compute_edges_energy order,
+        # captured once so the hot path skips per-call attribute lookups;
+        # build a new evaluator if the truck model is reconfigured
+        self._truck_params = tuple(float(p) for p in (
+            truck_model.drivetrain_eff, truck_model.regen_eff,
+            truck_model.mass_kg, truck_model.rolling_res_coeff,
+            truck_model.air_density, truck_model.drag_coefficient,
+            truck_model.frontal_area, truck_model.aux_load_kw
+        ))
+
+    def _use_edge_table(self, edge_table):
+        self.edge_table = edge_table
+        self._table_graph = self.graph
+        self._table_key = (self.graph.number_of_nodes(), self.graph.number_of_edges())
+
+        # float64 working copies for the energy kernel
+        self._len = edge_table.length_m.astype(np.float64)
+        self._spd = edge_table.speed_mps.astype(np.float64)
+        self._grad = edge_table.grade.astype(np.float64)
+
+    def _sync_edge_table(self):
+        # Rebuild the edge table when the graph was replaced or has gained
+        # or lost nodes or edges since it was built (in-place edits of edge
+        # attributes are not detected)
+        graph = self.graph
+        key = (graph.number_of_nodes(), graph.number_of_edges())
+        if graph is not self._table_graph or key != self._table_key:
+            self._use_edge_table(EdgeTable.from_graph(graph))
+
     # -----------------------------------------------------------
     # COMPUTE TOTAL ROUTE ENERGY
     # -----------------------------------------------------------
@@ -22,36 +59,43 @@ class RouteEnergyEvaluator:
         Compute energy & SOC evolution for a path.
         """
 
-        soc = initial_soc
-        total_energy_kwh = 0.0
-        segments = []
+        self._sync_edge_table()
+        idx = self.edge_table.path_edges(path_nodes)
 
-        for i in range(len(path_nodes) - 1):
-            u = path_nodes[i]
-            v = path_nodes[i + 1]
-            edge = self.graph.get_edge_data(u, v)[0]
+        length_m = self._len[idx]
+        speed = self._spd[idx]
+        gradient = self._grad[idx]
 
-            length_m = edge["length"]
-            speed = edge["speed_kph"] * (1000/3600)
-            gradient = edge.get("grade", 0.0)
+        # Whole-route energy in one compiled call (default 15 °C derating)
+        self.truck.apply_temperature_effect(15)
+        energy_kwh = compute_edges_energy(
+            length_m, speed, gradient, *self._truck_params,
+            float(self.truck.temperature_loss_factor)
+        )
 
-            energy_kwh = self.truck.compute_edge_energy(length_m, speed, gradient)
+        # SOC profile
+        soc_after = initial_soc - np.cumsum(energy_kwh) / self.truck.battery_capacity_kwh
+        soc_before = np.concatenate(([initial_soc], soc_after[:-1]))
 
-            # Update SOC
-            soc_new = self.truck.soc_after_segment(soc, energy_kwh)
-
-            segments.append({
+        segments = [
+            {
                 "u": u,
                 "v": v,
-                "length_m": length_m,
-                "energy_kwh": energy_kwh,
-                "soc_before": soc,
-                "soc_after": soc_new,
-                "speed_mps": speed,
-                "gradient": gradient
-            })
-
-            soc = soc_new
-            total_energy_kwh += energy_kwh
+                "length_m": l,
+                "energy_kwh": e,
+                "soc_before": s0,
+                "soc_after": s1,
+                "speed_mps": sp,
+                "gradient": g
+            }
+            for u, v, l, e, s0, s1, sp, g in zip(
+                path_nodes[:-1], path_nodes[1:],
+                length_m.tolist(), energy_kwh.tolist(),
+                soc_before.tolist(), soc_after.tolist(),
+                speed.tolist(), gradient.tolist()
+            )
+        ]
+
+        total_energy_kwh = float(energy_kwh.sum())
 
         return segments, total_energy_kwh